@@ -1,8 +1,16 @@
+import os
+
 from setuptools import find_packages, setup
 
 with open('README.md') as f:
     long_description = f.read()
 
+# Optionally compile the (un)packing hot paths with mypyc
+ext_modules = []
+if os.environ.get('STARPARSE_MYPYC', '').upper() in ('1', 'T', 'TRUE'):
+    from mypyc.build import mypycify
+    ext_modules = mypycify(['starparse/pack.py', 'starparse/unpack.py'])
+
 setup(
     name='starparse',
     packages=find_packages(),
@@ -14,6 +22,7 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     url='https://github.com/buhanec/starparse',
+    ext_modules=ext_modules,
     classifiers=[
         'Topic :: Utilities',
         'Development Status :: 3 - Alpha',
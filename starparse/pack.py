@@ -1,53 +1,178 @@
 """Packing functionality."""
 
 from collections import OrderedDict
-from functools import wraps
-from struct import pack
-from typing import Any, Callable, Dict, List, TypeVar, Union, get_type_hints
+from functools import lru_cache, wraps
+from struct import Struct
+from typing import Any, Callable, Dict, List, Tuple, TypeVar, Union
 
 from starparse import config
 
 T = TypeVar('T')
-SBT = Union[str, int, float, list, dict, OrderedDict]
+SBT = Union[None, str, int, float, list, dict, OrderedDict]
 
 __all__ = ('PackingError', 'uint', 'int_', 'str_', 'bool_', 'none',
            'float_', 'type_', 'list_', 'dict_', 'typed', 'header')
 
+_DOUBLE = Struct('>d')
+_STR_CACHE_MAX_LEN = 64
+_FLOAT_LIST_MAX_LEN = 16
+_BOOL_BYTES = (bytearray(b'\x00'), bytearray(b'\x01'))
+
 
 class PackingError(Exception):
     """Packing error."""
 
 
-def check_type(f: Callable[[T], bytearray]) -> Callable[[T], bytearray]:
+def _type_error(f: Callable, expecting: type, value: Any) -> TypeError:
+    return TypeError(f'{f.__module__}.{f.__name__} expecting '
+                     f'{expecting.__name__} but got '
+                     f'{type(value).__name__} ({value!r})')
+
+
+def check_type(expecting: type) -> Callable[[Callable[[T], bytearray]],
+                                          Callable[[T], bytearray]]:
     """
     Check function argument type.
 
-    :param f: function to check param value for
-    :return: function with param value checking
+    Dicts are checked against ``OrderedDict`` or ``dict`` depending on the
+    current ``config.ORDERED_DICT``.
+
+    :param expecting: type expected for param value
+    :return: decorator adding param value checking
     """
-    @wraps(f)
-    def wrapper(value):
-        expecting = get_type_hints(f)['value']
-        if (expecting.__module__ == 'typing'
-                and expecting.__origin__ in (list, List)):
-            expecting = list
-        elif (expecting.__module__  == 'typing'
-              and expecting.__origin__ in (dict, Dict)):
-            if config.ORDERED_DICT:
-                expecting = OrderedDict
-            else:
-                expecting = dict
-        if not isinstance(value, expecting):
-            raise TypeError(f'{f.__module__}.{f.__name__} expecting '
-                            f'{expecting.__name__} but got '
-                            f'{type(value).__name__} ({value!r})')
+    def decorator(f: Callable[[T], bytearray]) -> Callable[[T], bytearray]:
+        if expecting is dict:
+            @wraps(f)
+            def dict_wrapper(value):
+                expecting_ = OrderedDict if config.ORDERED_DICT else dict
+                if not isinstance(value, expecting_):
+                    raise _type_error(f, expecting_, value)
+                return f(value)
+
+            return dict_wrapper
+
+        @wraps(f)
+        def wrapper(value):
+            if not isinstance(value, expecting):
+                raise _type_error(f, expecting, value)
+            return f(value)
+
+        return wrapper
+
+    return decorator
+
+
+def _uint_into(buffer: bytearray, value: int) -> None:
+    if value < 0:
+        raise PackingError(f'unsigned int cannot be negative: {value}')
+    if value < 128:
+        buffer.append(value)
+        return
+    shift = (value.bit_length() - 1) // 7 * 7
+    while shift:
+        buffer.append(value >> shift & 127 | 128)
+        shift -= 7
+    buffer.append(value & 127)
+
+
+def _int_into(buffer: bytearray, value: int) -> None:
+    # Zig-zag encoding
+    _uint_into(buffer, (-value << 1) - 1 if value < 0 else value << 1)
+
+
+def _str_encode(value: str, utf8: bool) -> bytes:
+    try:
+        encoded = value.encode('ascii')
+    except UnicodeEncodeError as e:
+        if not utf8:
+            raise PackingError(f'string encoding error: {value!r}') from e
+        encoded = value.encode('utf-8')
+    result = bytearray()
+    _uint_into(result, len(encoded))
+    result.extend(encoded)
+    return bytes(result)
+
+
+# Dict keys repeat heavily, so short strings are packed once and reused
+_str_encode_cached = lru_cache(maxsize=4096)(_str_encode)
+
+
+def _str_into(buffer: bytearray, value: str) -> None:
+    if len(value) <= _STR_CACHE_MAX_LEN:
+        buffer.extend(_str_encode_cached(value, config.UTF8))
+    else:
+        buffer.extend(_str_encode(value, config.UTF8))
+
+
+def _bool_into(buffer: bytearray, value: bool) -> None:
+    buffer.append(value)
+
+
+# pylint: disable=unused-argument
+# noinspection PyUnusedLocal
+def _none_into(buffer: bytearray, value: Any = None) -> None:
+    pass
 
-        return f(value)
 
-    return wrapper
+def _float_into(buffer: bytearray, value: float) -> None:
+    buffer.extend(_DOUBLE.pack(value))
 
 
-@check_type
+@lru_cache(maxsize=_FLOAT_LIST_MAX_LEN)
+def _float_list_struct(length: int) -> Struct:
+    return Struct('>' + 'Bd' * length)
+
+
+def _list_into(buffer: bytearray, value: List[SBT]) -> None:
+    _uint_into(buffer, len(value))
+    # Short float lists (positions, colours, ...) pack all tags and values at
+    # once, exact type checks match the _TYPED dispatch and stop at the first
+    # miss
+    # pylint: disable=unidiomatic-typecheck
+    if (0 < len(value) <= _FLOAT_LIST_MAX_LEN
+            and all(type(val) is float for val in value)):
+        args: List[Any] = [2] * (2 * len(value))
+        args[1::2] = value
+        buffer.extend(_float_list_struct(len(value)).pack(*args))
+        return
+    for val in value:
+        _typed_into(buffer, val)
+
+
+def _dict_into(buffer: bytearray, value: Dict[str, SBT]) -> None:
+    expecting = OrderedDict if config.ORDERED_DICT else dict
+    if not isinstance(value, expecting):
+        raise _type_error(dict_, expecting, value)
+    _uint_into(buffer, len(value))
+    for key, val in value.items():
+        if not isinstance(key, str):
+            raise _type_error(dict_, str, key)
+        _str_into(buffer, key)
+        _typed_into(buffer, val)
+
+
+_TYPED: Dict[type, Tuple[int, Callable[[bytearray, Any], None]]] = {
+    type(None): (1, _none_into),
+    float: (2, _float_into),
+    bool: (3, _bool_into),
+    int: (4, _int_into),
+    str: (5, _str_into),
+    list: (6, _list_into),
+    dict: (7, _dict_into),
+    OrderedDict: (7, _dict_into),
+}
+
+
+def _typed_into(buffer: bytearray, value: SBT) -> None:
+    try:
+        tag, handler = _TYPED[type(value)]
+    except KeyError as e:
+        raise PackingError(f'unsupported value type: {type(value)}') from e
+    buffer.append(tag)
+    handler(buffer, value)
+
+
+@check_type(int)
 def uint(value: int) -> bytearray:
     """
     Pack type to Starbound format.
@@ -56,18 +181,12 @@ def uint(value: int) -> bytearray:
     :return: bytearray
     :raises PackingError: when int negative
     """
-    if value < 0:
-        raise PackingError(f'unsigned int cannot be negative: {value}')
     result = bytearray()
-    result.insert(0, value & 127)
-    value >>= 7
-    while value:
-        result.insert(0, value & 127 | 128)
-        value >>= 7
+    _uint_into(result, value)
     return result
 
 
-@check_type
+@check_type(int)
 def int_(value: int) -> bytearray:
     """
     Pack int to Starbound format.
@@ -75,13 +194,12 @@ def int_(value: int) -> bytearray:
     :param value: int
     :return: bytearray
     """
-    value_ = abs(value * 2)
-    if value < 0:
-        value_ -= 1
-    return uint(value_)
+    result = bytearray()
+    _int_into(result, value)
+    return result
 
 
-@check_type
+@check_type(str)
 def str_(value: str) -> bytearray:
     """
     Pack string to Starbound format.
@@ -90,18 +208,12 @@ def str_(value: str) -> bytearray:
     :return: bytearray
     :raises PackingError: when string encoding error
     """
-    result = uint(len(value))
-    try:
-        result.extend(bytearray(value, 'ascii'))
-    except UnicodeEncodeError as e:
-        if config.UTF8:
-            result.extend(bytearray(value, 'utf-8'))
-        else:
-            raise PackingError(f'string encoding error: {value!r}') from e
+    result = bytearray()
+    _str_into(result, value)
     return result
 
 
-@check_type
+@check_type(bool)
 def bool_(value: bool) -> bytearray:
     """
     Pack bool to Starbound format.
@@ -109,7 +221,7 @@ def bool_(value: bool) -> bytearray:
     :param value: bool
     :return: bytearray
     """
-    return bytearray([value])
+    return _BOOL_BYTES[value].copy()
 
 
 # pylint: disable=unused-argument
@@ -124,7 +236,7 @@ def none(value: Any = None) -> bytearray:
     return bytearray()
 
 
-@check_type
+@check_type(float)
 def float_(value: float) -> bytearray:
     """
     Pack float to Starbound format.
@@ -132,7 +244,7 @@ def float_(value: float) -> bytearray:
     :param value: float
     :return: bytearray
     """
-    return bytearray(pack('>d', value))
+    return bytearray(_DOUBLE.pack(value))
 
 
 def type_(value: type) -> bytearray:
@@ -143,17 +255,14 @@ def type_(value: type) -> bytearray:
     :return: bytearray
     :raises PackingError: when unsupported value type
     """
-    types = dict(zip((type(None), float, bool, int, str, list, dict),
-                     range(1, 8)))
-    types[OrderedDict] = types[dict]
     try:
-        value_type = types[value]
+        tag, _ = _TYPED[value]
     except KeyError as e:
         raise PackingError(f'unsupported value type: {value}') from e
-    return uint(value_type)
+    return bytearray((tag,))
 
 
-@check_type
+@check_type(list)
 def list_(value: List[SBT]) -> bytearray:
     """
     Pack list to Starbound format.
@@ -161,13 +270,12 @@ def list_(value: List[SBT]) -> bytearray:
     :param value: type
     :return: bytearray
     """
-    result = uint(len(value))
-    for val in value:
-        result.extend(typed(val))
+    result = bytearray()
+    _list_into(result, value)
     return result
 
 
-@check_type
+@check_type(dict)
 def dict_(value: Dict[str, SBT]) -> bytearray:
     """
     Pack dict to Starbound format.
@@ -175,10 +283,8 @@ def dict_(value: Dict[str, SBT]) -> bytearray:
     :param value: type
     :return: bytearray
     """
-    result = uint(len(value))
-    for key, val in value.items():
-        result.extend(str_(key))
-        result.extend(typed(val))
+    result = bytearray()
+    _dict_into(result, value)
     return result
 
 
@@ -188,19 +294,10 @@ def typed(value: SBT) -> bytearray:
 
     :param value: value
     :return: bytearray
+    :raises PackingError: when unsupported value type
     """
-    handlers: Dict[type, Callable[[Any], bytearray]] = {
-        type(None): none,
-        bool: bool_,
-        int: int_,
-        float: float_,
-        list: list_,
-        dict: dict_,
-        OrderedDict: dict_,
-        str: str_
-    }
-    result = type_(type(value))
-    result.extend(handlers[type(value)](value))
+    result = bytearray()
+    _typed_into(result, value)
     return result
 
 
@@ -213,4 +310,7 @@ def header(save_format: bytes, entity: str, flags: List[int]) -> bytearray:
     :param flags: flags
     :return: bytearray
     """
-    return bytearray(save_format) + str_(entity) + bytearray(flags)
+    result = bytearray(save_format)
+    _str_into(result, entity)
+    result.extend(flags)
+    return result
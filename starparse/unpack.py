@@ -1,8 +1,9 @@
 """Unpacking functionality."""
 
 from collections import OrderedDict
-from struct import calcsize, unpack_from
-from typing import Any, Dict, List, Tuple, Union
+from functools import lru_cache
+from struct import Struct, calcsize, error as StructError, unpack_from
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 from starparse import config
 
@@ -10,13 +11,19 @@ __all__ = ('UnpackingError', 'struct', 'uint', 'int_', 'str_', 'bool_',
            'none', 'float_', 'type_', 'list_', 'dict_', 'typed', 'header')
 
 SBT = Union[None, str, int, float, list, dict, OrderedDict]
+Buffer = Union[bytes, bytearray, memoryview]
+
+_DOUBLE = Struct('>d')
+_FLAGS = Struct('5B')
+_FLOAT_LIST_MAX_LEN = 16
+_TYPES = (type(None), float, bool, int, str, list, dict)
 
 
 class UnpackingError(Exception):
     """Unpacking error."""
 
 
-def struct(fmt: str, buffer: bytes, offset: int = 0) -> Tuple[Any, int]:
+def struct(fmt: str, buffer: Buffer, offset: int = 0) -> Tuple[Any, int]:
     """
     Unpack struct from Starbound save file.
 
@@ -47,7 +54,7 @@ def struct(fmt: str, buffer: bytes, offset: int = 0) -> Tuple[Any, int]:
     raise UnpackingError('Multiple non-bytes in bytearray')
 
 
-def uint(buffer: bytes, offset: int = 0) -> Tuple[int, int]:
+def uint(buffer: Buffer, offset: int = 0) -> Tuple[int, int]:
     """
     Unpack unsigned int from Starbound save file.
 
@@ -55,6 +62,9 @@ def uint(buffer: bytes, offset: int = 0) -> Tuple[int, int]:
     :param offset: position in Starbound save file
     :return: unsigned int, new offset
     """
+    value = buffer[offset]
+    if not value & 128:
+        return value, offset + 1
     value = 0
     while True:
         tmp = buffer[offset]
@@ -65,7 +75,7 @@ def uint(buffer: bytes, offset: int = 0) -> Tuple[int, int]:
     return value, offset
 
 
-def int_(buffer: bytes, offset: int = 0) -> Tuple[int, int]:
+def int_(buffer: Buffer, offset: int = 0) -> Tuple[int, int]:
     """
     Unpack signed int from Starbound save file.
 
@@ -73,34 +83,34 @@ def int_(buffer: bytes, offset: int = 0) -> Tuple[int, int]:
     :param offset: position in Starbound save file
     :return: int, new offset
     """
-    value = 0
-    while True:
-        tmp = buffer[offset]
-        value = (value << 7) | (tmp & 127)
-        offset += 1
-        if not tmp & 128:
-            break
-    if value & 1:
-        value = -((value >> 1) + 1)
-    else:
-        value >>= 1
-    return value, offset
+    value, offset = uint(buffer, offset)
+    # Zig-zag decoding
+    return (value >> 1) ^ -(value & 1), offset
 
 
-def str_(buffer: bytes, offset: int = 0) -> Tuple[str, int]:
+def str_(buffer: Buffer, offset: int = 0) -> Tuple[str, int]:
     """
     Unpack str from Starbound save file.
 
     :param buffer: Starbound save file
     :param offset: position in Starbound save file
     :return: str, new offset
+    :raises UnpackingError: when string truncated or decoding error
     """
     length, offset = uint(buffer, offset)
-    fmt = '{0:d}c'.format(length)
-    return struct(fmt, buffer, offset)
-
-
-def bool_(buffer: bytes, offset: int = 0) -> Tuple[bool, int]:
+    end = offset + length
+    if end > len(buffer):
+        raise UnpackingError(f'String length {length} exceeds buffer')
+    data = buffer[offset:end]
+    try:
+        return str(data, 'ascii'), end
+    except UnicodeDecodeError as e:
+        if config.UTF8:
+            return str(data, 'utf-8'), end
+        raise UnpackingError(f'ASCII decoding error {bytes(data)!r}') from e
+
+
+def bool_(buffer: Buffer, offset: int = 0) -> Tuple[bool, int]:
     """
     Unpack bool from Starbound save file.
 
@@ -113,7 +123,7 @@ def bool_(buffer: bytes, offset: int = 0) -> Tuple[bool, int]:
 
 # pylint: disable=unused-argument
 # noinspection PyUnusedLocal
-def none(buffer: bytes, offset: int = 0) -> Tuple[None, int]:
+def none(buffer: Buffer, offset: int = 0) -> Tuple[None, int]:
     """
     Unpack None/unset from Starbound save file.
 
@@ -124,7 +134,7 @@ def none(buffer: bytes, offset: int = 0) -> Tuple[None, int]:
     return None, offset
 
 
-def float_(buffer: bytes, offset: int = 0) -> Tuple[float, int]:
+def float_(buffer: Buffer, offset: int = 0) -> Tuple[float, int]:
     """
     Unpack float from Starbound save file.
 
@@ -132,10 +142,10 @@ def float_(buffer: bytes, offset: int = 0) -> Tuple[float, int]:
     :param offset: position in Starbound save file
     :return: float, new offset
     """
-    return struct('>d', buffer, offset)
+    return _DOUBLE.unpack_from(buffer, offset)[0], offset + _DOUBLE.size
 
 
-def type_(buffer: bytes, offset: int = 0) -> Tuple[type, int]:
+def type_(buffer: Buffer, offset: int = 0) -> Tuple[type, int]:
     """
     Unpack type from Starbound save file.
 
@@ -144,38 +154,62 @@ def type_(buffer: bytes, offset: int = 0) -> Tuple[type, int]:
     :return: type, new offset
     :raises UnpackingError: when format not as expected
     """
-    types = [type(None), float, bool, int, str, list, dict]
     index, offset = uint(buffer, offset)
-    if index > len(types):
+    if not 0 < index <= len(_TYPES):
         raise UnpackingError(f'Unsupported value type: {index}')
-    return types[index - 1], offset
+    return _TYPES[index - 1], offset
+
 
+@lru_cache(maxsize=_FLOAT_LIST_MAX_LEN)
+def _float_list_struct(length: int) -> Struct:
+    return Struct('>' + 'xd' * length)
 
-def list_(buffer: bytes, offset: int = 0) -> Tuple[List[SBT], int]:
+
+def list_(buffer: Buffer, offset: int = 0) -> Tuple[List[SBT], int]:
     """
     Unpack list from Starbound save file.
 
     :param buffer: Starbound save file
     :param offset: position in Starbound save file
     :return: list, new offset
+    :raises UnpackingError: when list truncated or unsupported value type
     """
-    length, offset = uint(buffer, offset)
-    result = []
-    for _ in range(length):
-        item, offset = typed(buffer, offset)
-        result.append(item)
+    # Hot loop, bind globals locally and read the value tags inline
+    read_uint, handlers = uint, _TYPED
+    length, offset = read_uint(buffer, offset)
+    # Every item takes at least a byte, reject corrupt lengths before
+    # preallocating the result
+    if length > len(buffer) - offset:
+        raise UnpackingError(f'List length {length} exceeds buffer')
+
+    # Short float lists (positions, colours, ...) unpack all values at once
+    end = offset + 9 * length
+    if (0 < length <= _FLOAT_LIST_MAX_LEN and buffer[offset] == 2
+            and buffer[offset:end:9] == b'\x02' * length):
+        floats = _float_list_struct(length).unpack_from(buffer, offset)
+        return list(floats), end
+
+    result: List[SBT] = [None] * length
+    for i in range(length):
+        tag, offset = read_uint(buffer, offset)
+        if not 0 < tag <= len(handlers):
+            raise UnpackingError(f'Unsupported value type: {tag}')
+        result[i], offset = handlers[tag - 1](buffer, offset)
     return result, offset
 
 
-def dict_(buffer: bytes, offset: int = 0) -> Tuple[Dict[str, SBT], int]:
+def dict_(buffer: Buffer, offset: int = 0) -> Tuple[Dict[str, SBT], int]:
     """
     Unpack dict from Starbound save file.
 
     :param buffer: Starbound save file
     :param offset: position in Starbound save file
     :return: dict, new offset
+    :raises UnpackingError: when unsupported value type
     """
-    length, offset = uint(buffer, offset)
+    # Hot loop, bind globals locally and read the value tags inline
+    read_uint, read_str, handlers = uint, str_, _TYPED
+    length, offset = read_uint(buffer, offset)
 
     result: Dict[str, SBT]
     if config.ORDERED_DICT:
@@ -184,46 +218,50 @@ def dict_(buffer: bytes, offset: int = 0) -> Tuple[Dict[str, SBT], int]:
         result = {}
 
     for _ in range(length):
-        key, offset = str_(buffer, offset)
-        item, offset = typed(buffer, offset)
-        result[key] = item
+        key, offset = read_str(buffer, offset)
+        tag, offset = read_uint(buffer, offset)
+        if not 0 < tag <= len(handlers):
+            raise UnpackingError(f'Unsupported value type: {tag}')
+        result[key], offset = handlers[tag - 1](buffer, offset)
 
     return result, offset
 
 
-def typed(buffer: bytes, offset: int = 0) -> Tuple[SBT, int]:
+_TYPED: Tuple[Callable[[Buffer, int], Tuple[Any, int]], ...] = (
+    none, float_, bool_, int_, str_, list_, dict_
+)
+
+
+def typed(buffer: Buffer, offset: int = 0) -> Tuple[SBT, int]:
     """
     Unpack a typed data structure from the buffer at a given offset.
 
     :param buffer: buffer to read
     :param offset: offset in buffer
     :return: unpacked data
+    :raises UnpackingError: when unsupported value type
     """
-    handlers = {
-        type(None): none,
-        bool: bool_,
-        int: int_,
-        float: float_,
-        list: list_,
-        dict: dict_,
-        str: str_
-    }
-    value_type, offset = type_(buffer, offset)
-    value, offset = handlers[value_type](buffer, offset)
-    return value, offset
+    tag, offset = uint(buffer, offset)
+    if not 0 < tag <= len(_TYPED):
+        raise UnpackingError(f'Unsupported value type: {tag}')
+    return _TYPED[tag - 1](buffer, offset)
 
 
-def header(buffer: bytes, offset: int = 0) -> Tuple[bytes, str, List[int], int]:
+def header(buffer: Buffer, offset: int = 0) -> Tuple[bytes, str, List[int], int]:
     """
     Unpack a Starbound header structure from the buffer at a given offset.
 
     :param buffer: buffer to read
     :param offset: offset in buffer
     :return: Starbound header
+    :raises UnpackingError: when header truncated
     """
-    save_format = buffer[offset:offset + 6]
+    save_format = bytes(buffer[offset:offset + 6])
     offset += 6
     entity, offset = str_(buffer, offset=offset)
-    flags = list(buffer[offset:offset + 5])
-    offset += 5
+    try:
+        flags = list(_FLAGS.unpack_from(buffer, offset))
+    except StructError as e:
+        raise UnpackingError('Header flags exceed buffer') from e
+    offset += _FLAGS.size
     return save_format, entity, flags, offset
@@ -1,12 +1,16 @@
 """Utility functions."""
 
 import logging
-from typing import Any
+from typing import Any, List, Tuple, Union
 
 __all__ = ('diff',)
 
 logger = logging.getLogger(__name__)
 
+# Context path, either the root context or (parent path, format, key)
+_Path = Union[str, Tuple['_Path', str, Any]]
+_Stack = List[Tuple[Any, Any, _Path]]
+
 
 def diff(a: Any, b: Any, context: str) -> int:
     """
@@ -17,44 +21,61 @@ def diff(a: Any, b: Any, context: str) -> int:
     :param context: Context placing the values relative to root values
     :return: Count of diffs
     """
-    if isinstance(a, dict) and isinstance(b, dict):
-        return _dict_diff(a, b, context=context)
-    if isinstance(a, list) and isinstance(b, list):
-        return _list_diff(a, b, context=context)
-    return _generic_diff(a, b, context=context)
+    # Walk with an explicit stack, deep saves would hit the recursion limit
+    stack: _Stack = [(a, b, context)]
+    diffs = 0
+    while stack:
+        a, b, path = stack.pop()
+        if isinstance(a, dict) and isinstance(b, dict):
+            diffs += _dict_diff(a, b, path, stack)
+        elif isinstance(a, list) and isinstance(b, list):
+            diffs += _list_diff(a, b, path, stack)
+        else:
+            diffs += _generic_diff(a, b, path)
+    return diffs
+
 
+def _context(path: _Path) -> str:
+    # Context strings are only built when there is a diff to report
+    parts = []
+    while isinstance(path, tuple):
+        path, fmt, key = path
+        parts.append(fmt.format(key))
+    parts.append(path)
+    return ''.join(reversed(parts))
 
-def _dict_diff(a: Any, b: Any, context: str = 'base') -> int:
+
+def _dict_diff(a: Any, b: Any, path: _Path, stack: _Stack) -> int:
     a_extra = a.keys() - b.keys()
     b_extra = b.keys() - a.keys()
     diffs = 0
     if a_extra:
-        logger.warning(context)
+        logger.warning(_context(path))
         logger.warning('  extra keys in a: %s', a_extra)
         diffs += len(a_extra)
     if b_extra:
-        logger.warning(context)
+        logger.warning(_context(path))
         logger.warning('  extra keys in b: %s', b_extra)
         diffs += len(b_extra)
     for k in a.keys() & b.keys():
-        diffs += diff(a[k], b[k], context + '.' + k)
+        stack.append((a[k], b[k], (path, '.{}', k)))
     return diffs
 
 
-def _list_diff(a: Any, b: Any, context: str = 'base') -> int:
+def _list_diff(a: Any, b: Any, path: _Path, stack: _Stack) -> int:
     if len(a) != len(b):
-        logger.warning(context)
+        logger.warning(_context(path))
         logger.warning('  list len mismatch: %d, %d', len(a), len(b))
         return max(len(a), len(b))
-    diffs = 0
-    for i, va, vb in zip(map(str, range(len(a))), a, b):
-        diffs += diff(va, vb, context + '[' + i + ']')
-    return diffs
+    # Pushed in reverse so items are still compared in order
+    for i in reversed(range(len(a))):
+        stack.append((a[i], b[i], (path, '[{}]', i)))
+    return 0
 
 
-def _generic_diff(a: Any, b: Any, context: str = 'base') -> int:
+def _generic_diff(a: Any, b: Any, path: _Path = 'base') -> int:
     if a != b:
-        logger.warning(context)
+        logger.warning(_context(path))
         logger.warning('  generic mismatch')
         logger.warning('  %s (%s)', a, type(a).__name__)
         logger.warning('  %s (%s)', b, type(b).__name__)
@@ -65,6 +65,16 @@ def test_str(string: str):
     assert unpacked == string
 
 
+@pytest.mark.parametrize('string', ['Alen', 'Alén', '\u2603 snowman'])
+def test_str_utf8(string: str, monkeypatch):
+    monkeypatch.setattr(config, 'UTF8', True)
+
+    packed = pack.str_(string)
+    unpacked, offset = unpack.str_(packed)
+    assert offset == len(packed)
+    assert unpacked == string
+
+
 @pytest.mark.parametrize('value', [True, False])
 def test_bool(value: bool):
     packed = pack.bool_(value)
@@ -89,15 +99,6 @@ def test_float_nan(n: float):
     assert math.copysign(1.0, unpacked) == math.copysign(1.0, n)
 
 
-@pytest.mark.parametrize('n', [-float('nan'), float('nan')])
-def test_float_nan(n: float):
-    packed = pack.float_(n)
-    unpacked, offset = unpack.float_(packed)
-    assert offset == len(packed)
-    assert math.isnan(unpacked)
-    assert math.copysign(1.0, unpacked) == math.copysign(1.0, n)
-
-
 @given(n=floats(allow_nan=False))
 @example(n=float('inf'))
 @example(n=-float('inf'))
@@ -121,6 +122,7 @@ def test_types(packed: bytes, expected: Any, monkeypatch):
     unpacked, offset = unpack.type_(packed)
     assert offset == len(packed)
     assert unpacked == expected
+    assert pack.type_(expected) == packed
 
 
 @pytest.mark.parametrize('value', [
@@ -129,6 +131,9 @@ def test_types(packed: bytes, expected: Any, monkeypatch):
     ["a", "b", "c"],
     [1, "b", []],
     [1, "b", [1, "c"]],
+    [1.0, -2.5, float('inf')],
+    [1.0, 2, 3.0],
+    [[1.0, 2.0], [3.0, None]],
 ])
 def test_list(value: List[Any]):
     packed = pack.list_(value)
@@ -137,6 +142,39 @@ def test_list(value: List[Any]):
     assert unpacked == value
 
 
+def test_header_truncated():
+    packed = pack.header(b'SBVJ01', 'Player', [1, 2, 3, 4, 5])
+    assert unpack.header(packed) == (b'SBVJ01', 'Player', [1, 2, 3, 4, 5],
+                                     len(packed))
+    with pytest.raises(unpack.UnpackingError):
+        unpack.header(packed[:-1])
+
+
+@pytest.mark.parametrize('length, bulk', [(16, True), (17, False)])
+def test_list_float_bulk_cutoff(length: int, bulk: bool):
+    value = [i / 3 for i in range(length)]
+    pack._float_list_struct.cache_clear()
+    unpack._float_list_struct.cache_clear()
+
+    packed = pack.list_(value)
+    unpacked, offset = unpack.list_(packed)
+    assert offset == len(packed)
+    assert unpacked == value
+    assert pack._float_list_struct.cache_info().currsize == bulk
+    assert unpack._float_list_struct.cache_info().currsize == bulk
+
+
+@pytest.mark.parametrize('packed', [
+    b'\x03\x04\x00',
+    b'\x8f\xff\xff\xff\x7f\x04\x00',
+])
+def test_list_length_exceeds_buffer(packed: bytes):
+    with pytest.raises(unpack.UnpackingError):
+        unpack.list_(packed)
+    with pytest.raises(unpack.UnpackingError):
+        unpack.typed(b'\x06' + packed)
+
+
 @pytest.mark.parametrize('value', [
     {},
     {"a": 1, "b": 2},
@@ -165,3 +203,20 @@ def test_dict_ordered(value: 'OrderedDict_[Any, Any]', monkeypatch):
     unpacked, offset = unpack.dict_(packed)
     assert offset == len(packed)
     assert unpacked == value
+
+
+@pytest.mark.parametrize('packer, value, ordered_dict', [
+    (pack.uint, 1.0, True),
+    (pack.str_, b'a', True),
+    (pack.list_, (1, 2), True),
+    (pack.dict_, {}, True),
+    (pack.dict_, [], False),
+    (pack.typed, {'a': 1}, True),
+    (pack.list_, [{'a': 1}], True),
+    (pack.typed, OrderedDict(a={'b': 1}), True),
+])
+def test_check_type(packer, value, ordered_dict: bool, monkeypatch):
+    monkeypatch.setattr(config, 'ORDERED_DICT', ordered_dict)
+
+    with pytest.raises(TypeError):
+        packer(value)
@@ -0,0 +1,46 @@
+import logging
+import sys
+from typing import Any
+
+import pytest
+
+from starparse import util
+
+
+def nest(leaf: Any, depth: int, as_dict: bool) -> Any:
+    value = leaf
+    for _ in range(depth):
+        value = {'k': value} if as_dict else [value]
+    return value
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    (1, 1, 0),
+    (1, '1', 1),
+    ({'a': 1, 'b': 2}, {'a': 1, 'c': 3}, 2),
+    ([1, 2], [1, 2, 3], 3),
+    ({'a': [1, 2]}, [1, 2], 1),
+    ({'x': [1, 2, {'y': 3}], 'z': 1}, {'x': [1, 5, {'y': 4}], 'w': 2}, 4),
+    ({'x': [1, [2, 3]], 'y': {}}, {'x': [1, [2, 3]], 'y': {}}, 0),
+])
+def test_diff(a: Any, b: Any, expected: int):
+    assert util.diff(a, b, 'base') == expected
+
+
+@pytest.mark.parametrize('as_dict', [True, False])
+def test_diff_deep(as_dict: bool):
+    depth = sys.getrecursionlimit() + 100
+    a = nest(1, depth, as_dict)
+    b = nest(2, depth, as_dict)
+    assert util.diff(a, a, 'base') == 0
+    assert util.diff(a, b, 'base') == 1
+
+
+def test_diff_context(caplog):
+    a = {'x': [1, 2, {'y': 3}], 'z': [1]}
+    b = {'x': [1, 5, {'y': 4}], 'z': [1, 2]}
+    with caplog.at_level(logging.WARNING, logger=util.__name__):
+        assert util.diff(a, b, 'base') == 4
+    contexts = {r.getMessage() for r in caplog.records
+                if not r.getMessage().startswith(' ')}
+    assert contexts == {'base.x[1]', 'base.x[2].y', 'base.z'}